@@ -13,109 +13,145 @@ Alternatively, it can be used as a Python module:
 
 See README.md for more details."""
 
-from typing import Dict, Optional, Any
+import re
+import threading
+from typing import Dict, List, Tuple, Union, Any
 
 
 class Anglicize(object):
     """Convert a byte sequence of UTF-8 characters to their English
     transcriptions."""
 
+    __slots__ = (
+        "__state",
+        "__capitalization_mode",
+        "__first_capital_and_spaces",
+    )
+
     def __init__(self) -> None:
-        self.__state = Anglicize.XLAT_TREE
-        self.__finite_state: Optional[Dict[int, Any]] = None
-        self.__buf = bytearray()
+        # States are node numbers in the flattened XLAT_TREE;
+        # zero is the start state. A state also identifies the
+        # bytes consumed since the last transliteration, so they
+        # don't need to be buffered.
+        self.__state = 0
         self.__capitalization_mode = False
         self.__first_capital_and_spaces = bytearray()
-        self.__output = bytearray()
 
     @staticmethod
     def anglicize(text: bytes) -> bytearray:
         """Process a whole string and return its anglicized version."""
-        anglicize = Anglicize()
-        return anglicize.process_buf(text) + anglicize.finalize()
+        return anglicize(text)
 
     def process_buf(self, buf: bytes) -> bytearray:
         """Anglicize a buffer. Expect more to come."""
-        self.__output = bytearray()
-        for byte in buf:
-            self.__push_byte(byte)
-        return self.__output
+        output = bytearray()
+        append = output.append
+        # Walk the transition table inline; only the bytes that
+        # break a partial match need a call to __rescan().
+        # Everything used per byte is bound to a local name.
+        trans = _TRANS
+        emit = _EMIT
+        is_leaf = _IS_LEAF
+        is_title = _IS_TITLE
+        is_root_byte = _IS_ROOT_BYTE
+        search_pass_through = _PASS_THROUGH_RE.search
+        hold_first_capital = self.__hold_first_capital
+        hold_spaces_after_capital = self.__hold_spaces_after_capital
+        rescan = self.__rescan
+        state = self.__state
+        # Runs of bytes that would be relayed unchanged anyway are
+        # copied in one go, provided that they start in the start
+        # state outside of capitalization mode. Otherwise, the first
+        # byte of the run is left to the loop below, and the rest of
+        # the run, which is a run by itself, is tried again without
+        # searching for it anew.
+        pos = 0
+        match = search_pass_through(buf)
+        end = match.start() if match else len(buf)
+        while True:
+            for byte in buf[pos:end]:
+                if not state and not is_root_byte[byte]:
+                    # Only capitalization mode holds spaces back.
+                    if self.__capitalization_mode:
+                        hold_spaces_after_capital(byte, output)
+                    else:
+                        append(byte)
+                    continue
+                next_state = trans[state][byte]
+                while next_state < 0 and state:
+                    state = rescan(state, output)
+                    next_state = trans[state][byte]
+                if next_state < 0:
+                    hold_spaces_after_capital(byte, output)
+                elif is_leaf[next_state]:
+                    state = 0
+                    # Outside of capitalization mode, anything but
+                    # a capital letter goes to the output as is.
+                    if self.__capitalization_mode or is_title[next_state]:
+                        hold_first_capital(emit[next_state], output)
+                    else:
+                        output += emit[next_state]
+                else:
+                    state = next_state
+            if not match:
+                break
+            if not state and not self.__capitalization_mode:
+                output += buf[end:match.end()]
+                pos = match.end()
+            else:
+                pos = end
+                end += 1
+                if end < match.end():
+                    continue
+            match = search_pass_through(buf, match.end())
+            end = match.start() if match else len(buf)
+        self.__state = state
+        return output
 
     def finalize(self) -> bytearray:
         """Process and return the remainder of the internal buffer."""
-        self.__output = bytearray()
-        while self.__buf or self.__finite_state:
-            self.__skip_buf_byte()
+        output = bytearray()
+        while self.__state:
+            self.__state = self.__rescan(self.__state, output)
         if self.__capitalization_mode:
             if self.__first_capital_and_spaces:
-                self.__output += self.__first_capital_and_spaces
+                output += self.__first_capital_and_spaces
             self.__capitalization_mode = False
-        return self.__output
+        return output
 
-    def __push_byte(self, byte: int) -> None:
-        """Input another byte. Return the transliteration when it's ready."""
-        # Check if there is no transition from the current state
-        # for the given byte.
-        if byte not in self.__state:
-            if self.__state == Anglicize.XLAT_TREE:
-                # We're at the start state, which means that
-                # no bytes have been accumulated in the
-                # buffer and the new byte also cannot be
-                # converted.
-                self.__hold_spaces_after_capital(byte)
-            else:
-                self.__skip_buf_byte()
-                self.__push_byte(byte)
-        else:
-            new_state = self.__state[byte]
-            if not new_state[1]:
-                self.__state = Anglicize.XLAT_TREE
-                self.__finite_state = None
-                self.__buf = bytearray()
-                self.__hold_first_capital(new_state[0])
+    def __rescan(self, state: int, output: bytearray) -> int:
+        """Give up on the partial match and restart character
+        recognition after its first byte or after its longest
+        transliterated prefix. Return the resulting state."""
+        for xlat in _RESCAN_OUTPUT[state]:
+            if isinstance(xlat, int):
+                self.__hold_spaces_after_capital(xlat, output)
             else:
-                self.__state = new_state[1]
-                if new_state[0]:
-                    self.__finite_state = new_state
-                    self.__buf = bytearray()
-                else:
-                    self.__buf.append(byte)
-
-    def __skip_buf_byte(self) -> None:
-        """Restart character recognition in the internal buffer."""
-        self.__state = Anglicize.XLAT_TREE
-        if self.__finite_state:
-            self.__hold_first_capital(self.__finite_state[0])
-            self.__finite_state = None
-            buf = self.__buf
-        else:
-            self.__hold_spaces_after_capital(self.__buf[0])
-            buf = self.__buf[1:]
-        self.__buf = bytearray()
-        for byte in buf:
-            self.__push_byte(byte)
+                self.__hold_first_capital(xlat, output)
+        return _RESCAN_STATE[state]
 
-    def __hold_first_capital(self, xlat: bytes) -> None:
+    def __hold_first_capital(self, xlat: bytes, output: bytearray) -> None:
         """Check for capitalization mode."""
         if self.__capitalization_mode:
             if self.__first_capital_and_spaces:
                 if xlat.istitle():
-                    xlat = self.__first_capital_and_spaces + xlat
+                    output.extend(self.__first_capital_and_spaces.upper())
                     self.__first_capital_and_spaces = bytearray()
-                    self.__output += xlat.upper()
+                    output.extend(xlat.upper())
                     return
-                xlat = self.__first_capital_and_spaces + xlat
+                output.extend(self.__first_capital_and_spaces)
             elif xlat.istitle():
-                self.__output += xlat.upper()
+                output.extend(xlat.upper())
                 return
             self.__capitalization_mode = False
         elif xlat.istitle():
             self.__capitalization_mode = True
             self.__first_capital_and_spaces = bytearray(xlat)
             return
-        self.__output += xlat
+        output.extend(xlat)
 
-    def __hold_spaces_after_capital(self, byte: int) -> None:
+    def __hold_spaces_after_capital(
+            self, byte: int, output: bytearray) -> None:
         """Buffer spaces after the first capital letter."""
         if self.__capitalization_mode:
             if self.__first_capital_and_spaces:
@@ -124,10 +160,10 @@ class Anglicize(object):
                     return
                 else:
                     self.__capitalization_mode = False
-                    self.__output += self.__first_capital_and_spaces
+                    output.extend(self.__first_capital_and_spaces)
             elif byte != 32:
                 self.__capitalization_mode = False
-        self.__output.append(byte)
+        output.append(byte)
 
     # This variable is updated by make_xlat_tree.
     XLAT_TREE: Dict[int, Any] = {
@@ -1061,6 +1097,160 @@ class Anglicize(object):
     }
 
 
+def _flatten_xlat_tree(xlat_tree: Dict[int, Any]) -> \
+        Tuple[Tuple[Tuple[int, ...], ...], Tuple[bytes, ...],
+              Tuple[bool, ...]]:
+    """Turn the nested XLAT_TREE into a flat transition table.
+
+    Nodes are numbered breadth-first, the root being node zero.
+    Return three parallel tuples indexed by node number: rows of 256
+    next node numbers (-1 where there is no transition),
+    transliterations, and flags that tell leaf nodes apart."""
+    nodes: List[Any] = [[b"", xlat_tree]]
+    trans = []
+    # Share a single object between equal rows (all leaves have
+    # the same one) and between equal transliterations.
+    rows: Dict[Tuple[int, ...], Tuple[int, ...]] = {}
+    emit: Dict[bytes, bytes] = {}
+    for node in nodes:
+        row = [-1] * 256
+        if node[1]:
+            for byte, child in node[1].items():
+                row[byte] = len(nodes)
+                nodes.append(child)
+        trans.append(rows.setdefault(tuple(row), tuple(row)))
+    return tuple(trans), \
+        tuple(emit.setdefault(node[0], node[0]) for node in nodes), \
+        tuple(not node[1] for node in nodes)
+
+
+def _precompute_rescans(
+        trans: Tuple[Tuple[int, ...], ...], emit: Tuple[bytes, ...],
+        is_leaf: Tuple[bool, ...]) -> \
+        Tuple[Tuple[Tuple[Union[int, bytes], ...], ...], Tuple[int, ...]]:
+    """Compute the outcome of a broken partial match for each state.
+
+    When no transition exists for the next byte, the longest
+    transliterated prefix of the partial match is emitted (or its
+    first byte is relayed as is), and the remaining bytes are fed
+    to the state machine again. Since a state determines these
+    bytes, the whole rescan is done here in advance, Aho-Corasick
+    failure link style. Return two tuples indexed by state: the
+    emitted output as a tuple of transliterations (bytes) and
+    relayed bytes (int), and the state where the rescan ends."""
+    path = [b""] * len(trans)
+    finite_state = [0] * len(trans)
+    rescan_output: List[Tuple[Union[int, bytes], ...]] = [()] * len(trans)
+    rescan_state = [0] * len(trans)
+    # Breadth-first numbering guarantees that the states visited
+    # while rescanning a path are processed before the path itself.
+    for state, row in enumerate(trans):
+        if state and not is_leaf[state]:
+            output: List[Union[int, bytes]] = []
+            if finite_state[state]:
+                output.append(emit[finite_state[state]])
+                rest = path[state][len(path[finite_state[state]]):]
+            else:
+                output.append(path[state][0])
+                rest = path[state][1:]
+            rest_state = 0
+            for byte in rest:
+                while trans[rest_state][byte] < 0 and rest_state:
+                    output.extend(rescan_output[rest_state])
+                    rest_state = rescan_state[rest_state]
+                next_state = trans[rest_state][byte]
+                if next_state < 0:
+                    output.append(byte)
+                elif is_leaf[next_state]:
+                    output.append(emit[next_state])
+                    rest_state = 0
+                else:
+                    rest_state = next_state
+            rescan_output[state] = tuple(output)
+            rescan_state[state] = rest_state
+        for byte, child in enumerate(row):
+            if child >= 0:
+                path[child] = path[state] + bytes((byte,))
+                finite_state[child] = \
+                    child if emit[child] else finite_state[state]
+    return tuple(rescan_output), tuple(rescan_state)
+
+
+_TRANS, _EMIT, _IS_LEAF = _flatten_xlat_tree(Anglicize.XLAT_TREE)
+
+_RESCAN_OUTPUT, _RESCAN_STATE = _precompute_rescans(_TRANS, _EMIT, _IS_LEAF)
+
+# Whether the transliteration of a state starts with a capital letter.
+_IS_TITLE = bytes(xlat.istitle() for xlat in _EMIT)
+
+# Bytes that can start a transliterated sequence. All other bytes
+# are relayed from the start state without looking at the table.
+_IS_ROOT_BYTE = bytes(next_state >= 0 for next_state in _TRANS[0])
+
+
+def _compile_pass_through_re(
+        trans: Tuple[Tuple[int, ...], ...], emit: Tuple[bytes, ...],
+        is_leaf: Tuple[bool, ...]) -> "re.Pattern[bytes]":
+    """Compile a regular expression that matches a run of ASCII
+    characters relayed unchanged from the start state.
+
+    Such a run consists of characters that don't start a
+    transliterated sequence, and of characters that do but are
+    followed by a byte that breaks the sequence right away (e.g.
+    a Latin letter that is not followed by a combining diacritical
+    mark). A run begins with a character of the former kind and is
+    at least two characters long; lone characters, such as spaces
+    between non-Latin words, are cheaper to leave to the loop."""
+    def byte_class(byte_values: List[int], negated: bool = False) -> bytes:
+        return (b"[^" if negated else b"[") + \
+            b"".join(b"\\x%02X" % byte for byte in byte_values) + b"]"
+
+    plain = byte_class([byte for byte in range(0x80) if trans[0][byte] < 0])
+    # Group the other characters by the bytes that can follow them.
+    broken: Dict[Tuple[int, ...], List[int]] = {}
+    for byte in range(0x80):
+        next_state = trans[0][byte]
+        if next_state >= 0 and not is_leaf[next_state] and \
+                not emit[next_state]:
+            broken.setdefault(tuple(
+                b for b, s in enumerate(trans[next_state]) if s >= 0),
+                []).append(byte)
+    # The lookahead requires the breaking byte to be present in the
+    # buffer; a character at the end of the buffer is left to the
+    # state machine.
+    return re.compile(plain + b"(?:" + plain + b"+" + b"".join(
+        b"|" + byte_class(bytes_) +
+        b"(?=" + byte_class(list(follow), negated=True) + b")"
+        for follow, bytes_ in broken.items()) + b")+")
+
+
+_PASS_THROUGH_RE = _compile_pass_through_re(_TRANS, _EMIT, _IS_LEAF)
+
+
+_thread_local = threading.local()
+
+
+def anglicize(text: bytes) -> bytearray:
+    """Process a whole string and return its anglicized version.
+
+    An Anglicize object is reused per thread instead of creating
+    a new one on every call, which matters when converting many
+    short strings in a loop."""
+    instance = getattr(_thread_local, "instance", None)
+    if instance is None:
+        instance = _thread_local.instance = Anglicize()
+    try:
+        return instance.process_buf(text) + instance.finalize()
+    except BaseException:
+        # Don't let a half-processed string affect the next call.
+        _thread_local.instance = None
+        raise
+
+
+# Block size for reading standard input in main().
+_READ_CHUNK = 1 << 20
+
+
 def main() -> None:
     """Apply anglicization to stdin and print the result to stdout."""
 
@@ -1069,10 +1259,12 @@ def main() -> None:
     anglicize = Anglicize()
 
     while True:
-        data = stdin.buffer.read(4096)
+        data = stdin.buffer.read(_READ_CHUNK)
         if not data:
             break
-        stdout.buffer.write(anglicize.process_buf(data))
+        output = anglicize.process_buf(data)
+        if output:
+            stdout.buffer.write(output)
 
     stdout.buffer.write(anglicize.finalize())
 
@@ -1,4 +1,4 @@
-from anglicize import Anglicize
+from anglicize import Anglicize, anglicize
 
 
 def test_finalize() -> None:
@@ -19,6 +19,18 @@ def test_buffering() -> None:
     output += anglicize.finalize()
     assert output == b'Ja mowie po polsku.'
 
+    # A letter at the end of a buffer can take a combining mark
+    # from the next one.
+    output = anglicize.process_buf(b'ab e')
+    output += anglicize.process_buf('\u0301x'.encode())
+    output += anglicize.finalize()
+    assert output == b'ab ex'
+
+    output = anglicize.process_buf('Я  '.encode())
+    output += anglicize.process_buf('ЩЕ'.encode())
+    output += anglicize.finalize()
+    assert output == b'YA  SCHE'
+
 
 def test_capitalization() -> None:
     assert Anglicize.anglicize('Cześć!'.encode()) == b'Czeshch!'
@@ -28,7 +40,33 @@ def test_capitalization() -> None:
     assert Anglicize.anglicize('Я говорю'.encode()) == b'Ya govoryu'
     assert Anglicize.anglicize('ЯЩЕРИЦА'.encode()) == b'YASCHERITSA'
     assert Anglicize.anglicize('Я ЩЕКОЧУ'.encode()) == b'YA SCHEKOCHU'
+    assert Anglicize.anglicize('Я  ЩЕ'.encode()) == b'YA  SCHE'
+
+    # Spaces held after a capital letter must not be rescanned
+    # one by one; this used to take quadratic time.
+    spaces = b' ' * 100000
+    assert Anglicize.anglicize('Щ'.encode() + spaces + b'x') == \
+        b'Sch' + spaces + b'x'
+    assert Anglicize.anglicize('ЩЩ'.encode() + spaces + b'x') == \
+        b'SCHSCH' + spaces + b'x'
 
 
 def test_pass_through_unrecognized_utf8() -> None:
     assert Anglicize.anglicize('¿Adónde?'.encode()) == '¿Adonde?'.encode()
+
+
+def test_broken_partial_match() -> None:
+    assert Anglicize.anglicize('Ç'.encode() + b'\xcc') == b'S\xcc'
+    assert Anglicize.anglicize(b'e\xcc!') == b'e\xcc!'
+
+    anglicize = Anglicize()
+    output = anglicize.process_buf('ç'.encode() + b'\xcc')
+    output += anglicize.process_buf(b'\xcc\x87x')
+    output += anglicize.finalize()
+    assert output == b's\xcc\xcc\x87x'
+
+
+def test_anglicize_function() -> None:
+    assert anglicize('Cześć!'.encode()) == b'Czeshch!'
+    assert anglicize('ε'.encode()[:1]) == 'ε'.encode()[:1]
+    assert anglicize('λληνικά'.encode()) == b'llinika'